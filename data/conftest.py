@@ -0,0 +1,15 @@
+import importlib.util
+import os
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope="session")
+def server():
+    """data-server.py, imported as a module (its file name isn't a valid module name)."""
+    spec = importlib.util.spec_from_file_location("data_server", os.path.join(HERE, "data-server.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
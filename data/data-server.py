@@ -1,19 +1,44 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.middleware.gzip import GZipMiddleware
+from typing import NamedTuple, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import functools
 import networkx as nx
-from util import add_best_interest_matches, load_graph, save_graph, add_place_edge
+import orjson
+from util import add_best_interest_matches, add_place_edge
+from graph_store import GraphStore, get_store
+from models import AddPersonRequest, AddPersonWithPlaceRequest, GetPairsNearbyPlaceRequest
 from fastapi import Query
 from itertools import combinations
-from networkx.algorithms.link_prediction import jaccard_coefficient
-from geopy.distance import geodesic
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.neighbors import BallTree
 
 
 GRAPH_FILE = 'graph.json'
 TOPICS_FILE = 'interests.txt'
+EARTH_RADIUS_METERS = 6371000
+# Mersenne prime for the MinHash hash family; small enough that a * x + b fits in int64
+MINHASH_PRIME = (1 << 31) - 1
+# Permutation counts /get_pairs_approx accepts
+MINHASH_NUM_PERMS = (64, 128, 256)
+# lsh_bands weights: a missed pair costs more than an extra candidate, which is only scored exactly
+LSH_FALSE_POSITIVE_WEIGHT = 0.05
+LSH_FALSE_NEGATIVE_WEIGHT = 0.95
 
-app = FastAPI()
+store = get_store(GRAPH_FILE)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Parse the graph once at startup rather than on the first request
+    store.snapshot()
+    yield
+    # Fold the change log into graph.json so the next start parses a single file
+    store.compact()
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow requests from your Next.js frontend (running on localhost:3000)
 app.add_middleware(
@@ -23,12 +48,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# graph_data and the pair lists are large, repetitive JSON that compresses well
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 
-@app.get("/api/graph_data")
-def get_graph_data():
-    people_graph = load_graph(GRAPH_FILE)
-    
+GRAPH_DATA_NODE_FIELDS = ("id", "type", "label", "name", "description")
+
+def _graph_data(people_graph: nx.Graph) -> tuple[list[dict], list[dict]]:
+    """Builds the JSON-serializable (nodes, edges) lists served by /api/graph_data."""
     # Convert nodes to JSON-serializable format
     nodes = []
     for node_id, node_data in people_graph.nodes(data=True):
@@ -45,54 +72,119 @@ def get_graph_data():
         nodes.append(node)
     
     # Convert edges to JSON-serializable format
-    edges = []
-    for source, target, edge_data in people_graph.edges(data=True):
-        edge = {
-            "source": source,
-            "target": target
-        }
-        # Add edge attributes if they exist
-        if "relationship" in edge_data:
-            edge["relationship"] = edge_data["relationship"]
-        if "weight" in edge_data:
-            edge["weight"] = edge_data["weight"]
-        edges.append(edge)
+    edges = [_edge_dict(source, target, edge_data) for source, target, edge_data in people_graph.edges(data=True)]
     
-    return {"nodes": nodes, "edges": edges}
+    return nodes, edges
+
+def _edge_dict(source, target, edge_data: dict) -> dict:
+    edge = {
+        "source": source,
+        "target": target
+    }
+    # Add edge attributes if they exist
+    if "relationship" in edge_data:
+        edge["relationship"] = edge_data["relationship"]
+    if "weight" in edge_data:
+        edge["weight"] = edge_data["weight"]
+    return edge
+
+def _neighborhood_graph_data(people_graph: nx.Graph, index: "GraphIndex", nodes_by_id: dict, person_id: str) -> tuple[list[dict], list[dict]]:
+    """
+    A person's neighborhood: the person, their interests and everyone sharing one of them, with
+    the person-interest edges between these. Empty if person_id isn't a person in the graph.
+    """
+    interests = index.person_interests.get(person_id)
+    if interests is None:
+        return [], []
+    # The inverted index gives each interest's people directly, with no neighbor walks
+    others = sorted(set().union(*(index.interest_people[i] for i in interests)) - {person_id})
+    people = [person_id, *others]
+    wanted = set(interests)
+    nodes = [nodes_by_id[n] for n in (*people, *interests)]
+    edges = [
+        _edge_dict(p, i, people_graph.adj[p][i])
+        for p in people for i in index.person_interests[p] if i in wanted
+    ]
+    return nodes, edges
+
+@app.get("/api/graph_data")
+def get_graph_data(request: Request,
+                   neighborhood_of: Optional[str] = Query(None, description="Only return this person's neighborhood"),
+                   node_type: Optional[str] = Query(None, alias="type", pattern="^(person|interest|place)$"),
+                   offset: int = Query(0, ge=0),
+                   limit: Optional[int] = Query(None, ge=0),
+                   fields: Optional[str] = Query(None, description="Comma-separated node fields, e.g. id,type")):
+    """
+    Returns the graph as node and edge lists. With neighborhood_of, only that person's
+    neighborhood is returned (see _neighborhood_graph_data). Nodes can be filtered by type, paged with offset/limit and
+    projected to a subset of fields; edges are then the ones between the returned nodes.
+    Without any of these, the whole graph is returned.
+    """
+    node_fields = None
+    if fields is not None:
+        node_fields = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = set(node_fields) - set(GRAPH_DATA_NODE_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
 
+    stamp, people_graph = store.snapshot()
+    headers = {}
+    if stamp is not None:
+        headers["ETag"] = f'W/"{stamp}"'
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+    nodes, edges = store.derived(people_graph, "graph_data", _graph_data)
+    if neighborhood_of is not None:
+        index = store.derived(people_graph, "index", graph_index)
+        nodes_by_id = store.derived(people_graph, "graph_data_nodes", lambda _: {node["id"]: node for node in nodes})
+        nodes, edges = _neighborhood_graph_data(people_graph, index, nodes_by_id, neighborhood_of)
+    elif node_type is None and offset == 0 and limit is None and node_fields is None:
+        # The full body is serialized once per graph version; skip FastAPI's encoder entirely
+        content = store.derived(people_graph, "graph_data_payload", lambda _: orjson.dumps({"nodes": nodes, "edges": edges}))
+        return Response(content=content, media_type="application/json", headers=headers)
 
-# Request/response models
-class AddPersonRequest(BaseModel):
-    person_id: str
-    phone_number: Optional[str]
-    query: str
+    if node_type is not None:
+        nodes = [node for node in nodes if node["type"] == node_type]
+    nodes = nodes[offset:] if limit is None else nodes[offset:offset + limit]
+    if node_type is not None or offset or limit is not None:
+        ids = {node["id"] for node in nodes}
+        edges = [edge for edge in edges if edge["source"] in ids and edge["target"] in ids]
+    if node_fields is not None:
+        nodes = [{f: node[f] for f in node_fields if f in node} for node in nodes]
+    return Response(content=orjson.dumps({"nodes": nodes, "edges": edges}), media_type="application/json", headers=headers)
 
-class AddPersonWithPlaceRequest(BaseModel):
-    person_id: str
-    phone_number: Optional[str]
-    latitude: float
-    longitude: float
 
-class GetPairsNearbyPlaceRequest(BaseModel):
-    jaccard_threshold: float = Query(0.2, ge=0.0, le=1.0)
-    meters_threshold: float = Query(10000, ge=0.0, le=10000.0)
-    person_id: str
+def _add_place(request: AddPersonWithPlaceRequest):
+    with store.update() as people_graph:
+        add_place_edge(
+            graph=people_graph,
+            person_id=request.person_id,
+            phone_number = request.phone_number,
+            latitude=request.latitude,
+            longitude=request.longitude
+        )
 
+def _add_interests(request: AddPersonRequest):
+    with store.update() as people_graph:
+        # Call the function with predefined parameters
+        add_best_interest_matches(
+            graph=people_graph,
+            person_id=request.person_id,
+            query=request.query,
+            phone_number=request.phone_number,
+            topics_file_path=TOPICS_FILE,
+            top_n=3,
+            score_threshold=0.4
+        )
+
+# The graph copy, interest matching and save all block, so they run in a worker thread
+# to keep the event loop serving other requests meanwhile
 @app.post("/api/add_person_with_place")
 async def add_person_with_place(request: AddPersonWithPlaceRequest):
-    people_graph = load_graph(GRAPH_FILE)
-    add_place_edge(
-        graph=people_graph,
-        person_id=request.person_id,
-        phone_number = request.phone_number,
-        latitude=request.latitude,
-        longitude=request.longitude
-    )
-    save_graph(people_graph, GRAPH_FILE)
+    await asyncio.to_thread(_add_place, request)
 
 @app.post("/api/add_person_with_interest")
 async def add_person_with_interest(request: AddPersonRequest):
-    people_graph = load_graph(GRAPH_FILE)
     """
     Add a person with their interests to the graph.
     
@@ -100,17 +192,7 @@ async def add_person_with_interest(request: AddPersonRequest):
     - **query**: Interest query (e.g., "physics of stars and galaxies")
     """
     try:
-        # Call the function with predefined parameters
-        add_best_interest_matches(
-            graph=people_graph,
-            person_id=request.person_id,
-            query=request.query,
-            phone_number=request.phone_number,
-            topics_file_path=TOPICS_FILE,
-            top_n=3,
-            score_threshold=0.4
-        )
-        save_graph(people_graph, GRAPH_FILE)
+        await asyncio.to_thread(_add_interests, request)
         
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"Topics file not found: {TOPICS_FILE}")
@@ -119,102 +201,429 @@ async def add_person_with_interest(request: AddPersonRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+class GraphIndex(NamedTuple):
+    person_interests: dict[str, tuple[str, ...]]
+    person_places: dict[str, tuple[tuple[float, float], ...]]
+    # Inverse of person_interests
+    interest_people: dict[str, tuple[str, ...]]
+
+def graph_index(G: nx.Graph) -> GraphIndex:
+    """
+    Groups every person's neighbors by node type in a single pass over the graph, so handlers
+    do dict lookups instead of re-filtering neighbors. Meant to be built once per graph version;
+    the result must not be mutated.
+    """
+    node_type = {n: a.get("type") for n, a in G.nodes(data=True)}
+    person_interests, person_places = {}, {}
+    interest_people: dict[str, list[str]] = {}
+    for p, t in node_type.items():
+        if t != "person":
+            continue
+        neighbors = G.adj[p]
+        interests = person_interests[p] = tuple(nbr for nbr in neighbors if node_type[nbr] == "interest")
+        person_places[p] = tuple(nbr for nbr in neighbors if node_type[nbr] == "place")
+        for interest in interests:
+            interest_people.setdefault(interest, []).append(p)
+    interest_people = {interest: tuple(people) for interest, people in interest_people.items()}
+    return GraphIndex(person_interests, person_places, interest_people)
+
 # helper for pairs_with_common_interest
-def load_people_tags(graph_file: str) -> dict[str, set[str]]:
-    G = load_graph(graph_file)
-    return {
-        p: {nbr for nbr in G.neighbors(p) if G.nodes[nbr].get("type") == "interest"}
-        for p, a in G.nodes(data=True) if a.get("type") == "person"
-    }
+def load_people_tags(person_interests: dict[str, tuple[str, ...]]) -> tuple[dict[str, int], tuple[str, ...]]:
+    """
+    Encodes every person's interests (see GraphIndex.person_interests) as an integer bitmask over
+    a shared interest vocabulary.
+    
+    Returns:
+        (masks, bit_to_interest): masks maps person -> bitmask, and bit i of a mask stands for
+        bit_to_interest[i]. The vocabulary is sorted, so decoded interests come out sorted.
+    """
+    bit_to_interest = tuple(sorted({i for interests in person_interests.values() for i in interests}))
+    interest_to_bit = {name: 1 << i for i, name in enumerate(bit_to_interest)}
+    masks = {p: sum(interest_to_bit[i] for i in interests) for p, interests in person_interests.items()}
+    return masks, bit_to_interest
+
+def _mask_bits(mask: int):
+    """Yields the indices of the set bits of mask in ascending order."""
+    while mask:
+        lsb = mask & -mask
+        yield lsb.bit_length() - 1
+        mask ^= lsb
+
+def mask_to_interests(mask: int, bit_to_interest: tuple[str, ...]) -> list[str]:
+    """Decodes an interest bitmask back into (sorted) interest names."""
+    return [bit_to_interest[i] for i in _mask_bits(mask)]
+
+def _masks_to_matrix(masks: list[int], num_interests: int) -> csr_matrix:
+    """
+    Unpacks interest bitmasks into a sparse (masks x interests) 0/1 matrix. The masks are laid
+    out as little-endian bytes and expanded with np.unpackbits, so no Python loop runs per bit.
+    """
+    nbytes = max(1, (num_interests + 7) // 8)
+    buf = np.frombuffer(b"".join(m.to_bytes(nbytes, "little") for m in masks), dtype=np.uint8)
+    bits = np.unpackbits(buf.reshape(len(masks), nbytes), axis=1, bitorder="little")[:, :num_interests]
+    return csr_matrix(bits, dtype=np.float32)
+
+def _group_by_mask(pt: dict[str, int]) -> tuple[dict[int, list[str]], list[int]]:
+    """Groups people with identical interest sets, so each distinct set is scored once."""
+    groups: dict[int, list[str]] = {}
+    for p in sorted(pt):
+        groups.setdefault(pt[p], []).append(p)
+    return groups, list(groups)
 
-def lat_lon_to_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+def _expand_groups(groups: dict[int, list[str]], masks: list[int], i_idx, j_idx, scores) -> list[tuple[str, str, float]]:
+    """Turns scored (distinct set, distinct set) pairs back into sorted (person1, person2, jaccard) tuples."""
+    results = []
+    for i, j, s in zip(i_idx, j_idx, scores):
+        if i == j:
+            # people sharing the exact same interest set
+            results.extend((u, v, s) for u, v in combinations(groups[masks[i]], 2))
+        else:
+            results.extend(
+                (u, v, s) if u < v else (v, u, s)
+                for u in groups[masks[i]] for v in groups[masks[j]]
+            )
+    results.sort()
+    return results
+
+def _overlapping_pairs(X: csr_matrix, sizes: np.ndarray, threshold: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns (i, j, intersection size) for the row pairs i <= j of X that share at least one
+    column and whose sizes don't already rule out a Jaccard coefficient of threshold.
+    
+    |A & B| / |A | B| <= min(|A|, |B|) / max(|A|, |B|), so rows are grouped by size and each
+    size class is multiplied only against the classes it can reach. Sets with nothing in common
+    score 0 and can't pass, so only the stored entries of those products are returned.
     """
-    Convert latitude and longitude differences to meters using geopy.
+    by_size = {size: np.flatnonzero(sizes == size) for size in np.unique(sizes).tolist() if size > 0}
+    parts_i, parts_j, parts_inter = [], [], []
+    for small, rows in by_size.items():
+        cols = np.concatenate([c for large, c in by_size.items() if large >= small and small / large >= threshold])
+        C = (X[rows] @ X[cols].T).tocoo()
+        i, j = rows[C.row], cols[C.col]
+        # Larger classes pair with this one exactly once from here; within the class keep i <= j
+        keep = (sizes[j] > small) | (j >= i)
+        parts_i.append(i[keep])
+        parts_j.append(j[keep])
+        parts_inter.append(C.data[keep])
+    if not parts_i:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty, np.zeros(0)
+    return np.concatenate(parts_i), np.concatenate(parts_j), np.concatenate(parts_inter).astype(np.float64)
+
+def jaccard_pairs(pt: dict[str, int], num_interests: int, threshold: float) -> list[tuple[str, str, float]]:
+    """
+    Finds every pair of people whose interest Jaccard coefficient is at least threshold.
+    
+    People with identical interest sets are grouped first, so each distinct set is scored once.
+    A sparse (distinct sets) x interests matrix X then gives all pairwise intersection sizes
+    via X @ X.T, and its row sums give the set sizes needed for the unions.
+    
+    Returns:
+        (person1, person2, jaccard) tuples with person1 < person2, in sorted order
+    """
+    groups, masks = _group_by_mask(pt)
+    X = _masks_to_matrix(masks, num_interests)
+    sizes = np.asarray(X.sum(axis=1)).ravel().astype(np.float64)
+    if threshold > 0:
+        i_idx, j_idx, inter = _overlapping_pairs(X, sizes, threshold)
+    else:
+        # Every pair passes, including the ones sharing no interest
+        i_idx, j_idx = np.triu_indices(len(masks))
+        inter = (X @ X.T).toarray()[i_idx, j_idx].astype(np.float64)
+    union = sizes[i_idx] + sizes[j_idx] - inter
+    J = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+    keep = J >= threshold
+    return _expand_groups(groups, masks, i_idx[keep].tolist(), j_idx[keep].tolist(), J[keep].tolist())
+
+def minhash_signatures(X: csr_matrix, num_perm: int, seed: int = 1) -> np.ndarray:
+    """
+    Computes a (rows x num_perm) MinHash signature matrix for the rows of a 0/1 matrix, using
+    num_perm random hashes (a * x + b) mod p over the column indices. Empty rows get all p.
+    Values are below 2 ** 31, so they are stored as uint32.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MINHASH_PRIME, num_perm, dtype=np.int64)
+    b = rng.integers(0, MINHASH_PRIME, num_perm, dtype=np.int64)
+    hashes = ((np.arange(X.shape[1], dtype=np.int64)[:, None] * a + b) % MINHASH_PRIME).astype(np.uint32)
+    signatures = np.full((X.shape[0], num_perm), MINHASH_PRIME, dtype=np.uint32)
+    nonempty = np.diff(X.indptr) > 0
+    if X.nnz:
+        # Minimum over each row's stored columns, one segment per non-empty row
+        signatures[nonempty] = np.minimum.reduceat(hashes[X.indices], X.indptr[:-1][nonempty], axis=0)
+    return signatures
+
+@functools.lru_cache(maxsize=256)
+def lsh_bands(threshold: float, num_perm: int, false_positive_weight: float = LSH_FALSE_POSITIVE_WEIGHT,
+              false_negative_weight: float = LSH_FALSE_NEGATIVE_WEIGHT) -> tuple[int, int]:
+    """
+    Picks (bands, rows) with bands * rows <= num_perm the way datasketch's MinHashLSH does: two
+    sets with Jaccard s collide in some band with probability 1 - (1 - s ** rows) ** bands, and
+    the choice minimizes the weighted sum of that probability integrated below threshold (false
+    positives) and its complement integrated above it (false negatives).
+    """
+    s = np.linspace(0.0, 1.0, 1001)
+    ds = s[1] - s[0]
+    params = np.array([(b, r) for b in range(1, num_perm + 1) for r in range(1, num_perm // b + 1)])
+    bands, rows = params[:, :1], params[:, 1:]
+    collide = 1 - (1 - s ** rows) ** bands
+    false_positives = (collide * (s < threshold)).sum(axis=1) * ds
+    false_negatives = ((1 - collide) * (s >= threshold)).sum(axis=1) * ds
+    best = np.argmin(false_positive_weight * false_positives + false_negative_weight * false_negatives)
+    return int(params[best, 0]), int(params[best, 1])
+
+class MinHashIndex(NamedTuple):
+    groups: dict[int, list[str]]
+    masks: list[int]
+    # masks packed by _masks_to_bitsets, for exact scoring
+    bits: np.ndarray
+    # (masks x num_perm) MinHash signatures of the masks
+    signatures: np.ndarray
+
+def minhash_index(pt: dict[str, int], num_interests: int, num_perm: int) -> MinHashIndex:
+    """Signs every distinct interest set once; the bands are cut per query by lsh_candidates."""
+    groups, masks = _group_by_mask(pt)
+    signatures = minhash_signatures(_masks_to_matrix(masks, num_interests), num_perm)
+    return MinHashIndex(groups, masks, _masks_to_bitsets(masks, num_interests), signatures)
+
+def _pairs_within_buckets(keys: np.ndarray) -> np.ndarray:
+    """(k, 2) array of every (i, j) with i < j and keys[i] == keys[j], without a Python loop per bucket."""
+    n = len(keys)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    bucket_start = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+    bucket_end = np.append(bucket_start[1:], n)
+    # Position k of the sorted order pairs with positions k + 1 .. end of its bucket - 1
+    partners = np.repeat(bucket_end, bucket_end - bucket_start) - np.arange(n) - 1
+    left = np.repeat(np.arange(n), partners)
+    right = left + 1 + np.arange(len(left)) - np.repeat(np.cumsum(partners) - partners, partners)
+    # The sort is stable, so order[left] < order[right]
+    return np.stack((order[left], order[right]), axis=1)
+
+def lsh_candidates(signatures: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    """
+    (k, 2) array of (i, j) signature rows with i < j that agree on every row of at least one band.
+    Each band is hashed to a single uint64 key; a rare key collision only adds a candidate, which
+    exact scoring then drops.
+    """
+    n = len(signatures)
+    codes = []
+    for band in range(bands):
+        block = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        keys = np.zeros(n, dtype=np.uint64)
+        for column in block.T:
+            keys = keys * np.uint64(1000003) + column
+        pairs = _pairs_within_buckets(keys)
+        codes.append(pairs[:, 0].astype(np.int64) * n + pairs[:, 1])
+    # Sort and drop repeats rather than np.unique, which is much slower on tens of millions of codes
+    codes = np.sort(np.concatenate(codes)) if codes else np.zeros(0, dtype=np.int64)
+    codes = codes[np.concatenate(([True], codes[1:] != codes[:-1]))] if len(codes) else codes
+    return np.stack((codes // max(n, 1), codes % max(n, 1)), axis=1)
+
+def _masks_to_bitsets(masks: list[int], num_interests: int) -> np.ndarray:
+    """Packs interest bitmasks into a (masks x words) uint64 array; bit i of a mask lands in word i // 64."""
+    nwords = max(1, (num_interests + 63) // 64)
+    buf = b"".join(m.to_bytes(nwords * 8, "little") for m in masks)
+    return np.frombuffer(buf, dtype="<u8").reshape(len(masks), nwords)
+
+def bitset_jaccard(bits: np.ndarray, i_idx: np.ndarray, j_idx: np.ndarray) -> np.ndarray:
+    """
+    Jaccard coefficients between rows i_idx[k] and j_idx[k] of a bitset array, from the popcounts
+    of their AND and OR word by word; 0.0 where both sets are empty.
+    """
+    a, b = bits[i_idx], bits[j_idx]
+    inter = np.bitwise_count(a & b).sum(axis=1, dtype=np.int64)
+    union = np.bitwise_count(a | b).sum(axis=1, dtype=np.int64)
+    return np.divide(inter, union, out=np.zeros(len(inter)), where=union > 0)
+
+def approximate_jaccard_pairs(index: MinHashIndex, threshold: float) -> list[tuple[str, str, float]]:
+    """
+    Like jaccard_pairs, but only scores the MinHash LSH candidates, with bands chosen by
+    lsh_bands for threshold. Every returned coefficient is exact; pairs that never collided in a
+    band are missed.
+    """
+    pairs = lsh_candidates(index.signatures, *lsh_bands(threshold, index.signatures.shape[1]))
+    # Each distinct set is also paired with itself, for the people sharing it
+    diagonal = np.arange(len(index.masks))
+    i_idx = np.concatenate((diagonal, pairs[:, 0]))
+    j_idx = np.concatenate((diagonal, pairs[:, 1]))
+    J = bitset_jaccard(index.bits, i_idx, j_idx)
+    keep = J >= threshold
+    return _expand_groups(index.groups, index.masks, i_idx[keep].tolist(), j_idx[keep].tolist(), J[keep].tolist())
+
+def _to_unit_vectors(places) -> np.ndarray:
+    """Converts (latitude, longitude) degrees into an (N, 3) array of points on the unit sphere."""
+    lat, lon = np.radians(np.asarray(places, dtype=np.float64).reshape(-1, 2)).T
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+def _great_circle_meters(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Great-circle distance in meters between unit vectors a and b (broadcast over leading axes).
+    Uses Vincenty's spherical formula atan2(|a x b|, a . b), which stays accurate from a few
+    meters up to antipodal points, unlike haversine's arcsin.
+    """
+    return EARTH_RADIUS_METERS * np.arctan2(np.linalg.norm(np.cross(a, b), axis=-1), (a * b).sum(axis=-1))
+
+class PlaceIndex(NamedTuple):
+    owners: list[str]
+    places: list[tuple[float, float]]
+    # owners as an array, for vectorized comparisons
+    owner_ids: np.ndarray
+    # places as unit vectors, as stored in tree
+    points: np.ndarray
+    tree: Optional[BallTree]
+
+def place_index(person_places: dict[str, tuple]) -> PlaceIndex:
+    """
+    Puts every person's places into a single BallTree over unit vectors, so a radius query only
+    visits places that are actually close. Meant to be built once per graph version.
     
     Args:
-        lat1, lon1: First point (latitude, longitude) in degrees
-        lat2, lon2: Second point (latitude, longitude) in degrees
+        person_places: Maps person -> (latitude, longitude) place nodes
+    """
+    owners, places = [], []
+    for p, ps in person_places.items():
+        owners.extend([p] * len(ps))
+        places.extend(ps)
+    points = _to_unit_vectors(places)
+    return PlaceIndex(owners, places, np.array(owners), points, BallTree(points) if places else None)
+
+def nearby_place_pairs(index: PlaceIndex, people: set[str], meters_threshold: float) -> dict[tuple[str, str], list[dict]]:
+    """
+    Finds every pair of people from people who have places within meters_threshold of each other.
+    Only those people's places are queried against the index.
+    
+    Args:
+        index: Places of everyone in the graph, from place_index()
+        people: People to consider
+        meters_threshold: Maximum great-circle distance between two places
     
     Returns:
-        Distance in meters
+        Maps (person1, person2) with person1 < person2 to their place_information entries
     """
-    point1 = (lat1, lon1)
-    point2 = (lat2, lon2)
-    return geodesic(point1, point2).meters
+    if index.tree is None or not people:
+        return {}
+    owner_ids, points, places = index.owner_ids, index.points, index.places
+    people_ids = np.array(list(people))
+    sources = np.flatnonzero(np.isin(owner_ids, people_ids))
+    if not len(sources):
+        return {}
+    # A great-circle distance d corresponds to a straight-line chord of 2 sin(d / 2R)
+    chord = 2 * np.sin(min(meters_threshold / EARTH_RADIUS_METERS, np.pi) / 2)
+    hits = index.tree.query_radius(points[sources], r=chord)
+    i_idx = np.repeat(sources, [len(h) for h in hits])
+    j_idx = np.concatenate(hits)
+    # Keep each unordered pair of people once, oriented like the Jaccard pairs, and only
+    # partners that are among people too
+    keep = (owner_ids[i_idx] < owner_ids[j_idx]) & np.isin(owner_ids[j_idx], people_ids)
+    i_idx, j_idx = i_idx[keep], j_idx[keep]
+    distances = _great_circle_meters(points[i_idx], points[j_idx])
+
+    owners = index.owners
+    nearby: dict[tuple[str, str], list[dict]] = {}
+    for i, j, distance in zip(i_idx, j_idx, distances):
+        if distance <= meters_threshold:
+            nearby.setdefault((owners[i], owners[j]), []).append({
+                "nearby_place_person_1_latlong": places[i],
+                "nearby_place_person_2_latlong": places[j],
+                "distance_meters": round(distance, 2)
+            })
+    return nearby
+
+def _compute_pairs(graph_store: GraphStore, jaccard_threshold: float, meters_threshold: Optional[float] = None,
+                   num_perm: Optional[int] = None) -> list[dict]:
+    """
+    Shared implementation of the pair endpoints: one pass over the Jaccard candidates that,
+    when meters_threshold is given, keeps only people with places within that distance of
+    each other and attaches their place_information. When num_perm is given, candidates come
+    from MinHash LSH with that many permutations instead of the exact all-pairs search.
+    """
+    G = graph_store.get_graph()
+    index = graph_store.derived(G, "index", graph_index)
+    # Tags are rebuilt only when the graph version changes, not on every pair query
+    pt, bit_to_interest = graph_store.derived(G, "people_tags", lambda _: load_people_tags(index.person_interests))
+    if num_perm is None:
+        candidates = jaccard_pairs(pt, len(bit_to_interest), jaccard_threshold)
+    else:
+        # Only the signatures are cached, once per graph version and permutation count; the
+        # threshold-dependent bands are cut per request
+        lsh = graph_store.derived(G, f"minhash:{num_perm}",
+                                  lambda _: minhash_index(pt, len(bit_to_interest), num_perm))
+        candidates = approximate_jaccard_pairs(lsh, jaccard_threshold)
+    nearby = None
+    if meters_threshold is not None:
+        # The place tree is built once per graph version; only people who already passed the
+        # Jaccard filter are queried against it
+        places = graph_store.derived(G, "places", lambda _: place_index(index.person_places))
+        involved = {p for u, v, _ in candidates for p in (u, v)}
+        nearby = nearby_place_pairs(places, involved, meters_threshold)
+    # Everyone's interests are decoded (already sorted) once per graph version; only the shared
+    # interests depend on the pair, and the same few intersections recur, so those are decoded
+    # once per request
+    sorted_interests = graph_store.derived(
+        G, "sorted_interests", lambda _: {p: tuple(mask_to_interests(m, bit_to_interest)) for p, m in pt.items()}
+    )
+    shared: dict[int, list[str]] = {}
+    def shared_interests(mask: int) -> list[str]:
+        names = shared.get(mask)
+        if names is None:
+            names = shared[mask] = mask_to_interests(mask, bit_to_interest)
+        return names
 
-@app.post("/get_pairs_nearby_place")
-async def get_pairs_nearby_place(request: GetPairsNearbyPlaceRequest):
-    pt = load_people_tags(GRAPH_FILE)
-    G = load_graph(GRAPH_FILE)
-    people = sorted(pt)
-    tags = sorted({t for ts in pt.values() for t in ts})
-    B = nx.Graph()
-    B.add_nodes_from(people, bipartite="people")
-    B.add_nodes_from(tags, bipartite="tags")
-    for p, ts in pt.items():
-        for t in ts:
-            B.add_edge(p, t)
     results = []
-    if len(people) >= 2:
-        for u, v, s in jaccard_coefficient(B, combinations(people, 2)):
-            s = float(s)
-            if s >= request.jaccard_threshold:
-                tmp_res = []
-                t1, t2 = pt[u], pt[v]
-                places_u = {nbr for nbr in G.neighbors(u) if G.nodes[nbr].get("type") == "place"}
-                places_v = {nbr for nbr in G.neighbors(v) if G.nodes[nbr].get("type") == "place"}
-                for place_u in places_u:
-                    for place_v in places_v:
-                        distance = lat_lon_to_meters(place_u[0], place_u[1], place_v[0], place_v[1])
-                        if distance <= request.meters_threshold:
-                            tmp_res.append({
-                                "nearby_place_person_1_latlong": place_u,
-                                "nearby_place_person_2_latlong": place_v,
-                                "distance_meters": round(distance, 2)
-                            })
-                if not tmp_res:
-                    continue
-
-                results.append({
-                    "person1": u,
-                    "person2": v,
-                    "person1_interests": sorted(t1),
-                    "person2_interests": sorted(t2),
-                    "shared_interests": sorted(t1 & t2),
-                    "jaccard": round(s, 6),
-                    "place_information": tmp_res,
-                    "description" : "People with similar interests and nearby places."
-                })
-
-    return { "pairs" : results}
+    for u, v, s in candidates:
+        if nearby is not None and (u, v) not in nearby:
+            continue
+        pair = {
+            "person1": u,
+            "person2": v,
+            "person1_interests": sorted_interests[u],
+            "person2_interests": sorted_interests[v],
+            "shared_interests": shared_interests(pt[u] & pt[v]),
+            "jaccard": round(s, 6),
+        }
+        if nearby is not None:
+            pair["place_information"] = nearby[(u, v)]
+        results.append(pair)
+    return results
+
+def _json_response(payload: dict) -> Response:
+    # Returning the response directly skips FastAPI's jsonable_encoder walk over every pair;
+    # orjson encodes the numpy distances itself
+    return Response(content=orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY), media_type="application/json")
+
+@app.post("/get_pairs_nearby_place")
+def get_pairs_nearby_place(request: GetPairsNearbyPlaceRequest):
+    results = _compute_pairs(store, request.jaccard_threshold, request.meters_threshold)
+    return _json_response({"pairs": results})
+
+def _pairs_store(graph_file: str) -> GraphStore:
+    # graph_file comes from the client, so it may only name the served graph; any other path would
+    # read an arbitrary file and keep a GraphStore for it for the life of the process
+    if graph_file != GRAPH_FILE:
+        raise HTTPException(status_code=400, detail=f"graph_file must be {GRAPH_FILE}")
+    return store
+
 @app.get("/get_pairs")
-async def pairs(threshold: float = Query(0.2, ge=0.0, le=1.0),
+def pairs(threshold: float = Query(0.2, ge=0.0, le=1.0),
           graph_file: str = Query(GRAPH_FILE)):
-    pt = load_people_tags(graph_file)
-    people = sorted(pt)
-    tags = sorted({t for ts in pt.values() for t in ts})
-    B = nx.Graph()
-    B.add_nodes_from(people, bipartite="people")
-    B.add_nodes_from(tags, bipartite="tags")
-    for p, ts in pt.items():
-        for t in ts:
-            B.add_edge(p, t)
-    results = []
-    if len(people) >= 2:
-        for u, v, s in jaccard_coefficient(B, combinations(people, 2)):
-            s = float(s)
-            if s >= threshold:
-                t1, t2 = pt[u], pt[v]
-                results.append({
-                    "person1": u,
-                    "person2": v,
-                    "person1_interests": sorted(t1),
-                    "person2_interests": sorted(t2),
-                    "shared_interests": sorted(t1 & t2),
-                    "jaccard": round(s, 6),
-                })
-    return {"threshold": threshold, "count": len(results), "pairs": results}
+    results = _compute_pairs(_pairs_store(graph_file), threshold)
+    return _json_response({"threshold": threshold, "count": len(results), "pairs": results})
+
+@app.get("/get_pairs_approx")
+def pairs_approx(threshold: float = Query(0.2, gt=0.0, le=1.0),
+                 num_perm: int = Query(128),
+                 graph_file: str = Query(GRAPH_FILE)):
+    """Same as /get_pairs, but uses MinHash LSH, which scales to large graphs at the cost of missing some pairs."""
+    if num_perm not in MINHASH_NUM_PERMS:
+        # Each accepted value keeps its own signatures cached, so only a few are allowed
+        raise HTTPException(status_code=422, detail=f"num_perm must be one of {', '.join(map(str, MINHASH_NUM_PERMS))}")
+    results = _compute_pairs(_pairs_store(graph_file), threshold, num_perm=num_perm)
+    return _json_response({"threshold": threshold, "num_perm": num_perm, "count": len(results), "pairs": results})
     
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, port=1234)
+    # uvicorn uses uvloop and httptools automatically when they are installed (uvicorn[standard]).
+    # Stay on one worker: each process would hold its own GraphStore, and log compaction in one
+    # could drop changes another just appended.
+    uvicorn.run(app, port=1234, loop="auto", http="auto", workers=1)
@@ -0,0 +1,146 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional, TypeVar
+
+import networkx as nx
+
+from util import append_graph_log, graph_changes, graph_log_path, load_graph, save_graph
+
+T = TypeVar("T")
+
+# The change log is folded into a new snapshot once it outgrows the snapshot (or this size,
+# whichever is larger), so rewriting the whole file stays amortized over many writes
+MIN_COMPACT_LOG_BYTES = 1 << 20
+
+
+class GraphStore:
+    """
+    Keeps one graph file parsed in memory and shares it between requests.
+
+    Published graphs are never mutated: readers can iterate a snapshot without locking, and values
+    cached through derived() stay valid until the next graph is published.
+    Writers go through update(), which edits a private copy and swaps it in once it is persisted.
+    Additions are appended to the file's change log rather than rewriting the whole file.
+    The file's mtime and log size are checked on every read, so edits made by other processes
+    (e.g. the testing.py script) are still picked up.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.log_path = graph_log_path(file_path)
+        self.graph = nx.Graph()
+        # Identifies the on-disk state the graph was loaded from or written to
+        self.stamp: Optional[str] = None
+        self._loaded = False
+        # Values computed from the current graph by derived(), dropped when it is replaced
+        self._derived: dict[str, object] = {}
+        # Guards swapping graph/stamp
+        self._lock = threading.Lock()
+        # Serializes read-modify-write cycles on the file
+        self._write_lock = threading.Lock()
+
+    def _file_stamp(self) -> Optional[str]:
+        """Snapshot mtime plus log length; None when neither file exists yet."""
+        try:
+            mtime = os.stat(self.file_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        log_size = self._log_size()
+        if mtime is None and not log_size:
+            return None
+        return f"{mtime or 0}-{log_size}"
+
+    def _log_size(self) -> int:
+        try:
+            return os.stat(self.log_path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def snapshot(self) -> tuple[Optional[str], nx.Graph]:
+        """
+        Returns (stamp, graph), re-parsing the file only if it or its log changed on disk since the
+        last load. stamp changes whenever the graph does and is None when nothing was saved yet.
+        """
+        stamp = self._file_stamp()
+        with self._lock:
+            if not self._loaded or stamp != self.stamp:
+                self._publish(load_graph(self.file_path), stamp)
+                self._loaded = True
+            return self.stamp, self.graph
+
+    def _publish(self, graph: nx.Graph, stamp: Optional[str]):
+        # Caller holds self._lock
+        self.graph = graph
+        self.stamp = stamp
+        self._derived = {}
+
+    def get_graph(self) -> nx.Graph:
+        """Returns the current graph. It is shared between requests and must not be mutated."""
+        return self.snapshot()[1]
+
+    def derived(self, graph: nx.Graph, name: str, build: Callable[[nx.Graph], T]) -> T:
+        """
+        Returns build(graph), computing it at most once per graph version. graph should come from
+        snapshot()/get_graph(); if it has been replaced since, the value is computed but not cached.
+        Cached values are shared between requests and must not be mutated.
+        """
+        with self._lock:
+            if graph is self.graph and name in self._derived:
+                return self._derived[name]
+        value = build(graph)
+        with self._lock:
+            if graph is self.graph:
+                self._derived[name] = value
+        return value
+
+    @contextmanager
+    def update(self):
+        """
+        Runs a read-modify-write transaction on the graph. Writers are serialized so concurrent
+        additions can't overwrite each other, and the yielded graph is a private copy that is only
+        persisted and published to readers if the block finishes without raising.
+        """
+        with self._write_lock:
+            current = self.get_graph()
+            graph = current.copy()
+            yield graph
+            changes = graph_changes(current, graph)
+            if changes == []:
+                return
+            if changes is None or self._log_size() > max(MIN_COMPACT_LOG_BYTES, self._snapshot_size()):
+                save_graph(graph, self.file_path)
+            else:
+                append_graph_log(changes, self.log_path)
+            with self._lock:
+                self._publish(graph, self._file_stamp())
+
+    def _snapshot_size(self) -> int:
+        try:
+            return os.stat(self.file_path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def compact(self):
+        """Folds the change log into a fresh snapshot, e.g. before shutting down."""
+        with self._write_lock:
+            if not os.path.exists(self.log_path):
+                return
+            graph = self.get_graph()
+            save_graph(graph, self.file_path)
+            with self._lock:
+                # Same graph, so derived values stay valid; only the on-disk stamp moved
+                if graph is self.graph:
+                    self.stamp = self._file_stamp()
+
+
+_stores: dict[str, GraphStore] = {}
+_stores_lock = threading.Lock()
+
+def get_store(file_path: str) -> GraphStore:
+    """Returns the process-wide GraphStore for file_path, creating it on first use."""
+    with _stores_lock:
+        store = _stores.get(file_path)
+        if store is None:
+            store = _stores[file_path] = GraphStore(file_path)
+        return store
@@ -2,13 +2,38 @@
 # Fast alternative to sentence transformers for document matching
 
 import numpy as np
-from rank_bm25 import BM25Okapi
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from collections import Counter
+from scipy.sparse import csc_matrix, csr_matrix, hstack, load_npz, save_npz
+from functools import partial
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer, strip_accents_unicode
 from typing import List, Dict, Tuple, Any, Optional
 import logging
-import pickle
+import json
 import os
+import re
+
+_NON_WORD = re.compile(r'[^\w\s]')
+# The same substitution as _NON_WORD for ASCII text, as a str.translate table, which skips the regex engine
+_ASCII_NON_WORD = str.maketrans({c: ' ' for c in map(chr, range(128)) if _NON_WORD.match(c)})
+
+def tfidf_features(tokens: List[str], ngram_range: Tuple[int, int] = (1, 2)) -> List[str]:
+    """
+    TF-IDF analyzer over HybridSearchEngine._tokenize output. Mirrors TfidfVectorizer's word
+    analyzer: accents stripped, single-character tokens and English stop words dropped, then
+    word n-grams over what is left.
+    """
+    words = []
+    for token in tokens:
+        if not token.isascii():
+            token = strip_accents_unicode(token)
+        if len(token) >= 2 and token not in ENGLISH_STOP_WORDS:
+            words.append(token)
+    
+    min_n, max_n = ngram_range
+    features = list(words) if min_n == 1 else []
+    for n in range(max(min_n, 2), min(max_n, len(words)) + 1):
+        features.extend(' '.join(words[i:i + n]) for i in range(len(words) - n + 1))
+    return features
 
 class HybridSearchEngine:
     """
@@ -24,20 +49,35 @@ class HybridSearchEngine:
             max_features: Maximum number of TF-IDF features
             ngram_range: N-gram range for TF-IDF (1,2) means unigrams and bigrams
         """
-        self.tfidf_vectorizer = TfidfVectorizer(
-            max_features=max_features,
-            ngram_range=ngram_range,
-            stop_words='english',
-            lowercase=True,
-            strip_accents='unicode'
-        )
-        self.bm25 = None
-        self.tfidf_matrix = None
+        self.tfidf_vectorizer = self._make_vectorizer(max_features, ngram_range)
+        # BM25 token -> column of score_matrix
+        self.bm25_vocab = {}
+        # (documents x columns) matrix holding the precomputed BM25 term scores in its first
+        # bm25_columns columns and the TF-IDF rows after them, see _set_score_matrix()
+        self.score_matrix = None
+        self.bm25_columns = 0
         self.documents = []
         self.document_ids = []
         self.tokenized_docs = []
+        self.text_field = "text"
+        self.id_field = "id"
+        # Identifies the indexed corpus, see documents_fingerprint()
+        self.engine_fingerprint = None
         self.is_fitted = False
         
+    @staticmethod
+    def _make_vectorizer(max_features: int, ngram_range: Tuple[int, int]) -> TfidfVectorizer:
+        # Documents and queries are tokenized once by _tokenize and the tokens shared with BM25;
+        # the analyzer turns them into the same features stop_words='english', strip_accents='unicode'
+        # and ngram_range would have given
+        return TfidfVectorizer(
+            max_features=max_features,
+            analyzer=partial(tfidf_features, ngram_range=ngram_range),
+            norm='l2',
+            # Plenty of precision for ranking, and halves the memory each query's product streams through
+            dtype=np.float32
+        )
+    
     def preprocess_documents(self, documents: List[Dict[str, Any]], 
                            text_field: str = "text", 
                            id_field: str = "id") -> None:
@@ -50,31 +90,119 @@ class HybridSearchEngine:
             id_field: Field name containing the document ID
         """
         self.documents = documents
+        self.text_field = text_field
+        self.id_field = id_field
+        self.engine_fingerprint = documents_fingerprint(documents, text_field, id_field)
         texts = [doc[text_field] for doc in documents]
         self.document_ids = [str(doc[id_field]) for doc in documents]
         
         # Tokenize for BM25
         self.tokenized_docs = [self._tokenize(text) for text in texts]
-        self.bm25 = BM25Okapi(self.tokenized_docs)
+        bm25_matrix, self.bm25_vocab = self._build_bm25(self.tokenized_docs)
         
-        # Generate TF-IDF matrix
-        self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(texts)
+        # Generate TF-IDF matrix from the same tokens
+        tfidf_matrix = self.tfidf_vectorizer.fit_transform(self.tokenized_docs)
+        self._set_score_matrix(bm25_matrix, tfidf_matrix)
         
         self.is_fitted = True
-        logging.info(f"Indexed {len(documents)} documents with {self.tfidf_matrix.shape[1]} TF-IDF features")
+        logging.info(f"Indexed {len(documents)} documents with {tfidf_matrix.shape[1]} TF-IDF features")
+    
+    @staticmethod
+    def _build_bm25(tokenized_docs: List[List[str]], k1: float = 1.5, b: float = 0.75,
+                    epsilon: float = 0.25) -> Tuple[csc_matrix, Dict[str, int]]:
+        """
+        Precomputes the Okapi BM25 score of every (document, token) pair, as in BM25S, so a query
+        only has to sum the columns of its tokens. Uses the same parameters and negative-IDF floor
+        as rank_bm25's BM25Okapi.
+        
+        Returns:
+            (matrix, vocab): a (documents x tokens) CSC matrix and the token -> column mapping
+        """
+        vocab: Dict[str, int] = {}
+        rows, cols, tfs = [], [], []
+        for d, tokens in enumerate(tokenized_docs):
+            for token, tf in Counter(tokens).items():
+                rows.append(d)
+                cols.append(vocab.setdefault(token, len(vocab)))
+                tfs.append(tf)
+        rows, cols, tf = np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp), np.array(tfs, dtype=np.float64)
+        n_docs = len(tokenized_docs)
+        doc_lens = np.array([len(tokens) for tokens in tokenized_docs], dtype=np.float64)
+        
+        df = np.bincount(cols, minlength=len(vocab))
+        idf = np.log(n_docs - df + 0.5) - np.log(df + 0.5)
+        if len(idf):
+            # Terms in more than half the documents get a small positive IDF instead of a negative one
+            idf[idf < 0] = epsilon * idf.mean()
+        
+        length_norm = k1 * (1 - b + b * doc_lens[rows] / doc_lens.mean()) if len(rows) else 0.0
+        scores = idf[cols] * tf * (k1 + 1) / (tf + length_norm)
+        # Stored as float32 like the TF-IDF matrix; the scores themselves are computed in float64
+        return csc_matrix((scores.astype(np.float32), (rows, cols)), shape=(n_docs, len(vocab))), vocab
+    
+    def _set_score_matrix(self, bm25_matrix: csc_matrix, tfidf_matrix: csr_matrix) -> None:
+        # BM25 and TF-IDF columns side by side, so a single sparse product scores queries against both.
+        # Only the stacked copy is kept; save_index slices the two parts back out
+        self.score_matrix = hstack([bm25_matrix, tfidf_matrix], format='csc')
+        self.bm25_columns = bm25_matrix.shape[1]
+    
+    def _score_queries(self, tokenized_queries: List[List[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Raw BM25 and TF-IDF scores of tokenized queries, as two (documents x queries) arrays computed
+        in one product with score_matrix. Each query gets two columns on the other side: its token
+        counts, which sum its tokens' BM25 columns, and its TF-IDF vector, whose dot product with the
+        L2-normalized document rows is their cosine similarity.
+        """
+        n_queries = len(tokenized_queries)
+        bm25_rows, bm25_cols = [], []
+        for q, tokens in enumerate(tokenized_queries):
+            for token in tokens:
+                if token in self.bm25_vocab:
+                    bm25_rows.append(self.bm25_vocab[token])
+                    bm25_cols.append(q)
+        query_tfidf = self._tfidf_query_vectors(tokenized_queries).tocoo()
+        rows = np.concatenate((np.array(bm25_rows, dtype=np.intp), query_tfidf.col + self.bm25_columns))
+        cols = np.concatenate((np.array(bm25_cols, dtype=np.intp), query_tfidf.row + n_queries))
+        values = np.concatenate((np.ones(len(bm25_rows), dtype=self.score_matrix.dtype), query_tfidf.data))
+        queries = csc_matrix((values, (rows, cols)), shape=(self.score_matrix.shape[1], 2 * n_queries))
+        scores = (self.score_matrix @ queries).toarray()
+        return scores[:, :n_queries], scores[:, n_queries:]
+    
+    def _tfidf_query_vectors(self, tokenized_queries: List[List[str]]) -> csr_matrix:
+        """
+        L2-normalized TF-IDF rows for tokenized queries, equal to tfidf_vectorizer.transform but
+        built straight from the fitted vocabulary and IDF weights.
+        """
+        vocabulary = self.tfidf_vectorizer.vocabulary_
+        idf = self.tfidf_vectorizer.idf_
+        analyzer = self.tfidf_vectorizer.analyzer
+        rows, cols, counts = [], [], []
+        for q, tokens in enumerate(tokenized_queries):
+            features = Counter(vocabulary[feature] for feature in analyzer(tokens) if feature in vocabulary)
+            rows.extend([q] * len(features))
+            cols.extend(features.keys())
+            counts.extend(features.values())
+        rows, cols = np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)
+        data = np.array(counts, dtype=np.float64) * idf[cols]
+        # Every stored value is positive, so each query with any known feature has a nonzero norm
+        norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=len(tokenized_queries)))
+        data /= norms[rows]
+        # Match the index's dtype, so the product doesn't upcast a copy of the whole matrix
+        return csr_matrix((data.astype(self.score_matrix.dtype), (rows, cols)), shape=(len(tokenized_queries), len(idf)))
     
     def _tokenize(self, text: str) -> List[str]:
         """Simple tokenization - can be enhanced with more sophisticated methods."""
-        import re
         # Remove punctuation and split
-        text = re.sub(r'[^\w\s]', ' ', text.lower())
+        text = text.lower()
+        text = text.translate(_ASCII_NON_WORD) if text.isascii() else _NON_WORD.sub(' ', text)
         return text.split()
     
     def find_best_matches(self, 
                          query: str, 
                          top_k: int = 10, 
                          bm25_weight: float = 0.4, 
-                         tfidf_weight: float = 0.6) -> List[Dict[str, Any]]:
+                         tfidf_weight: float = 0.6,
+                         score_threshold: Optional[float] = None) -> List[Dict[str, Any]]:
         """
         Find best matching documents using hybrid BM25 + TF-IDF search.
         
@@ -83,6 +211,7 @@ class HybridSearchEngine:
             top_k: Number of top results to return
             bm25_weight: Weight for BM25 scores (lexical matching)
             tfidf_weight: Weight for TF-IDF similarity scores
+            score_threshold: If given, drop results whose combined score is below it
             
         Returns:
             List of dictionaries containing matched documents with scores
@@ -90,82 +219,186 @@ class HybridSearchEngine:
         if not self.is_fitted:
             raise ValueError("Documents must be preprocessed before searching")
         
-        # BM25 search
-        tokenized_query = self._tokenize(query)
-        bm25_scores = self.bm25.get_scores(tokenized_query)
-        
-        # TF-IDF search
-        query_tfidf = self.tfidf_vectorizer.transform([query])
-        tfidf_scores = cosine_similarity(query_tfidf, self.tfidf_matrix).flatten()
+        # BM25 and TF-IDF search
+        bm25_scores, tfidf_scores = self._score_queries([self._tokenize(query)])
+        bm25_scores, tfidf_scores = bm25_scores[:, 0], tfidf_scores[:, 0]
         
-        # Normalize scores
+        # Normalize scores (both arrays were freshly computed for this query, so in place is safe)
         bm25_scores_norm = self._normalize_scores(bm25_scores)
         tfidf_scores_norm = self._normalize_scores(tfidf_scores)
         
         # Combine scores
-        combined_scores = []
-        for i, doc in enumerate(self.documents):
-            doc_id = self.document_ids[i]
-            bm25_score = bm25_scores_norm[i]
-            tfidf_score = tfidf_scores_norm[i]
-            
-            combined_score = (bm25_weight * bm25_score + tfidf_weight * tfidf_score)
+        combined = bm25_weight * bm25_scores_norm
+        combined += tfidf_weight * tfidf_scores_norm
+        
+        # Pick the top_k without sorting every document, keeping the earlier document first on ties;
+        # result dicts (with plain float scores) are only built for those
+        top_idx = self._top_indices(combined, top_k, score_threshold)
+        return [
+            {
+                'document': self.documents[i],
+                'score': float(combined[i]),
+                'bm25_score': float(bm25_scores_norm[i]),
+                'tfidf_score': float(tfidf_scores_norm[i]),
+                'document_id': self.document_ids[i]
+            }
+            for i in top_idx
+        ]
+    
+    def find_best_matches_batch(self,
+                                queries: List[str],
+                                top_k: int = 10,
+                                bm25_weight: float = 0.4,
+                                tfidf_weight: float = 0.6,
+                                score_threshold: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """
+        find_best_matches for several queries at once. Every query is scored in the same sparse
+        matrix product, so the index is swept once per batch instead of per query.
+        
+        Args:
+            queries: Search query strings
+            top_k: Number of top results to return per query
+            bm25_weight: Weight for BM25 scores (lexical matching)
+            tfidf_weight: Weight for TF-IDF similarity scores
+            score_threshold: If given, drop results whose combined score is below it
             
-            combined_scores.append({
-                'document': doc,
-                'score': combined_score,
-                'bm25_score': bm25_score,
-                'tfidf_score': tfidf_score,
-                'document_id': doc_id
-            })
-        
-        # Sort by combined score and return top_k
-        combined_scores.sort(key=lambda x: x['score'], reverse=True)
-        return combined_scores[:top_k]
+        Returns:
+            One list of results per query, as find_best_matches would return them
+        """
+        if not self.is_fitted:
+            raise ValueError("Documents must be preprocessed before searching")
+        if not queries:
+            return []
+        
+        bm25_scores, tfidf_scores = self._score_queries([self._tokenize(query) for query in queries])
+        
+        # Normalize each query's column, as _normalize_scores does for a single query
+        for scores in (bm25_scores, tfidf_scores):
+            scores -= scores.min(axis=0)
+            score_range = scores.max(axis=0)
+            constant = score_range == 0
+            scores /= np.where(constant, 1, score_range)
+            scores[:, constant] = 0.5
+        
+        combined = bm25_weight * bm25_scores
+        combined += tfidf_weight * tfidf_scores
+        
+        results = []
+        for q in range(len(queries)):
+            column = combined[:, q]
+            top_idx = self._top_indices(column, top_k, score_threshold)
+            results.append([
+                {
+                    'document': self.documents[i],
+                    'score': float(column[i]),
+                    'bm25_score': float(bm25_scores[i, q]),
+                    'tfidf_score': float(tfidf_scores[i, q]),
+                    'document_id': self.document_ids[i]
+                }
+                for i in top_idx
+            ])
+        return results
+    
+    @staticmethod
+    def _top_indices(scores: np.ndarray, k: int, min_score: Optional[float] = None) -> np.ndarray:
+        """
+        Indices of the k highest scores in descending order. Equal scores keep their original
+        order, matching a stable sort of all scores. If min_score is given, scores below it are
+        dropped before selecting, so they are never partitioned or sorted.
+        """
+        if min_score is not None:
+            candidates = np.flatnonzero(scores >= min_score)
+            return candidates[HybridSearchEngine._top_indices(scores[candidates], k)]
+        n = len(scores)
+        k = max(0, min(k, n))
+        if k == 0:
+            return np.zeros(0, dtype=np.intp)
+        if k < n:
+            cutoff = scores[np.argpartition(-scores, k - 1)[:k]].min()
+            above = np.flatnonzero(scores > cutoff)
+            at_cutoff = np.flatnonzero(scores == cutoff)[:k - len(above)]
+            idx = np.concatenate((above, at_cutoff))
+        else:
+            idx = np.arange(n)
+        return idx[np.argsort(-scores[idx], kind='stable')]
     
     def _normalize_scores(self, scores: np.ndarray) -> np.ndarray:
-        """Normalize scores to 0-1 range using min-max normalization."""
+        """
+        Normalize scores to 0-1 range using min-max normalization.
+        Works in place on scores, which must be a float array the caller owns.
+        """
         if len(scores) == 0:
-            return np.zeros_like(scores)
+            return scores
         
-        min_score, max_score = np.min(scores), np.max(scores)
-        if max_score == min_score:
-            return np.ones_like(scores) * 0.5  # All scores equal
-        return (scores - min_score) / (max_score - min_score)
+        min_score = scores.min()
+        score_range = scores.max() - min_score
+        if score_range == 0:
+            scores.fill(0.5)  # All scores equal
+            return scores
+        scores -= min_score
+        scores /= score_range
+        return scores
     
     def save_index(self, filepath: str) -> None:
-        """Save the trained model to disk for faster loading."""
-        index_data = {
-            'tfidf_vectorizer': self.tfidf_vectorizer,
-            'bm25': self.bm25,
-            'tfidf_matrix': self.tfidf_matrix,
-            'documents': self.documents,
-            'document_ids': self.document_ids,
-            'tokenized_docs': self.tokenized_docs,
-            'is_fitted': self.is_fitted
-        }
-        with open(filepath, 'wb') as f:
-            pickle.dump(index_data, f)
+        """
+        Save the trained model to disk for faster loading.
+        
+        filepath is a directory holding the two score matrices as .npz files and everything else
+        (vocabularies, IDF weights, documents) as JSON, so loading needs no unpickling.
+        """
+        os.makedirs(filepath, exist_ok=True)
+        save_npz(os.path.join(filepath, 'bm25.npz'), self.score_matrix[:, :self.bm25_columns])
+        save_npz(os.path.join(filepath, 'tfidf.npz'), self.score_matrix[:, self.bm25_columns:])
+        vectorizer = self.tfidf_vectorizer
+        with open(os.path.join(filepath, 'vocab.json'), 'w') as f:
+            json.dump({
+                'max_features': vectorizer.max_features,
+                'ngram_range': list(vectorizer.analyzer.keywords['ngram_range']),
+                'bm25_vocab': self.bm25_vocab,
+                'tfidf_vocab': {feature: int(col) for feature, col in vectorizer.vocabulary_.items()},
+                'tfidf_idf': vectorizer.idf_.tolist()
+            }, f)
+        with open(os.path.join(filepath, 'docs.json'), 'w') as f:
+            json.dump({
+                'documents': self.documents,
+                'document_ids': self.document_ids,
+                'text_field': self.text_field,
+                'id_field': self.id_field
+            }, f)
         logging.info(f"Index saved to {filepath}")
     
     def load_index(self, filepath: str) -> None:
-        """Load a pre-trained model from disk."""
-        if not os.path.exists(filepath):
-            raise FileNotFoundError(f"Index file not found: {filepath}")
+        """Load a pre-trained model saved by save_index from disk."""
+        if not os.path.isdir(filepath):
+            raise FileNotFoundError(f"Index directory not found: {filepath}")
         
-        with open(filepath, 'rb') as f:
-            index_data = pickle.load(f)
+        with open(os.path.join(filepath, 'vocab.json')) as f:
+            vocab = json.load(f)
+        with open(os.path.join(filepath, 'docs.json')) as f:
+            docs = json.load(f)
         
-        self.tfidf_vectorizer = index_data['tfidf_vectorizer']
-        self.bm25 = index_data['bm25']
-        self.tfidf_matrix = index_data['tfidf_matrix']
-        self.documents = index_data['documents']
-        self.document_ids = index_data['document_ids']
-        self.tokenized_docs = index_data['tokenized_docs']
-        self.is_fitted = index_data['is_fitted']
+        # Rebuild the fitted vectorizer from its vocabulary and IDF weights
+        self.tfidf_vectorizer = self._make_vectorizer(vocab['max_features'], tuple(vocab['ngram_range']))
+        self.tfidf_vectorizer.vocabulary_ = vocab['tfidf_vocab']
+        self.tfidf_vectorizer.idf_ = np.array(vocab['tfidf_idf'])
+        self._set_score_matrix(load_npz(os.path.join(filepath, 'bm25.npz')), load_npz(os.path.join(filepath, 'tfidf.npz')))
+        self.bm25_vocab = vocab['bm25_vocab']
+        self.documents = docs['documents']
+        self.document_ids = docs['document_ids']
+        self.text_field = docs['text_field']
+        self.id_field = docs['id_field']
+        # Only needed while building the index
+        self.tokenized_docs = []
+        # hash() of str is salted per process, so the fingerprint is recomputed rather than stored
+        self.engine_fingerprint = documents_fingerprint(self.documents, self.text_field, self.id_field)
+        self.is_fitted = True
         
         logging.info(f"Index loaded from {filepath}")
 
+def documents_fingerprint(documents: List[Dict[str, Any]], text_field: str = "text", id_field: str = "id") -> int:
+    """Cheap identity of a corpus: changes whenever any document's id or text does."""
+    return hash(tuple((str(doc[id_field]), doc[text_field]) for doc in documents))
+
 # Global search engine instance
 _global_search_engine = None
 
@@ -181,6 +414,7 @@ def find_best_matches(query: str,
                      top_k: int = 10, 
                      bm25_weight: float = 0.4,
                      tfidf_weight: float = 0.6,
+                     score_threshold: Optional[float] = None,
                      **kwargs) -> List[Dict[str, Any]]:
     """
     Replacement for the original find_best_matches method.
@@ -192,6 +426,7 @@ def find_best_matches(query: str,
         top_k: Number of results to return
         bm25_weight: Weight for BM25 lexical matching (default 0.4)
         tfidf_weight: Weight for TF-IDF semantic matching (default 0.6)
+        score_threshold: If given, drop results whose combined score is below it
         **kwargs: Additional arguments
         
     Returns:
@@ -199,15 +434,16 @@ def find_best_matches(query: str,
     """
     search_engine = get_search_engine()
     
-    # If documents provided, reindex (useful for dynamic document sets)
-    if documents:
+    # If documents provided, reindex only if they differ from what is already indexed
+    if documents and documents_fingerprint(documents) != search_engine.engine_fingerprint:
         search_engine.preprocess_documents(documents)
     
     return search_engine.find_best_matches(
         query=query,
         top_k=top_k,
         bm25_weight=bm25_weight,
-        tfidf_weight=tfidf_weight
+        tfidf_weight=tfidf_weight,
+        score_threshold=score_threshold
     )
 
 def preprocess_document_corpus(documents: List[Dict[str, Any]], 
@@ -0,0 +1,28 @@
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+# Request/response models
+class AddPersonRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    person_id: str
+    phone_number: Optional[str] = None
+    query: str
+
+class AddPersonWithPlaceRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    person_id: str
+    phone_number: Optional[str] = None
+    latitude: float
+    longitude: float
+
+class GetPairsNearbyPlaceRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    jaccard_threshold: float = Field(0.2, ge=0.0, le=1.0)
+    meters_threshold: float = Field(10000, ge=0.0, le=10000.0)
+    # Not used by the endpoint; accepted for existing clients
+    person_id: Optional[str] = None
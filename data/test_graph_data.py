@@ -0,0 +1,98 @@
+import networkx as nx
+import pytest
+from fastapi.testclient import TestClient
+
+from util import add_interest_edge, add_place_edge, save_graph
+
+
+@pytest.fixture
+def client(server, tmp_path, monkeypatch):
+    graph = nx.Graph()
+    add_interest_edge(graph, "alice", "555-0001", "chess")
+    add_interest_edge(graph, "bob", None, "chess")
+    add_interest_edge(graph, "bob", None, "go")
+    add_place_edge(graph, None, "alice", 42.36, -71.09)
+    monkeypatch.chdir(tmp_path)
+    save_graph(graph, server.GRAPH_FILE)
+    with TestClient(server.app) as client:
+        yield client
+
+
+def get(client, **params):
+    response = client.get("/api/graph_data", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def edge_set(data):
+    return {frozenset(map(str, (edge["source"], edge["target"]))) for edge in data["edges"]}
+
+
+def test_whole_graph(client):
+    data = get(client)
+    assert [node["id"] for node in data["nodes"]] == ["alice", "chess", "bob", "go", [42.36, -71.09]]
+    assert len(data["edges"]) == 4
+    # Unknown parameters such as the frontend's user_id don't narrow the graph
+    assert get(client, user_id="alice") == data
+
+
+def test_type_filter_keeps_edges_between_returned_nodes(client):
+    data = get(client, type="person")
+    assert [node["id"] for node in data["nodes"]] == ["alice", "bob"]
+    assert data["edges"] == []
+    assert client.get("/api/graph_data", params={"type": "robot"}).status_code == 422
+
+
+def test_offset_and_limit(client):
+    everything = get(client)
+    page = get(client, offset=1, limit=2)
+    assert page["nodes"] == everything["nodes"][1:3]
+    assert edge_set(page) == {frozenset(("chess", "bob"))}
+    assert get(client, offset=3)["nodes"] == everything["nodes"][3:]
+    assert get(client, limit=0) == {"nodes": [], "edges": []}
+
+
+def test_fields_projection(client):
+    data = get(client, fields="id, type")
+    assert data["nodes"][0] == {"id": "alice", "type": "person"}
+    assert len(data["edges"]) == 4
+    response = client.get("/api/graph_data", params={"fields": "id,phone_number"})
+    assert response.status_code == 400
+
+
+def test_not_modified_until_graph_changes(server, client):
+    response = client.get("/api/graph_data")
+    etag = response.headers["ETag"]
+    cached = client.get("/api/graph_data", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+    # The ETag covers the graph, not the query, so filtered views revalidate the same way
+    assert client.get("/api/graph_data", params={"type": "person"}, headers={"If-None-Match": etag}).status_code == 304
+
+    with server.store.update() as graph:
+        add_interest_edge(graph, "carol", None, "go")
+    changed = client.get("/api/graph_data", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert "carol" in [node["id"] for node in changed.json()["nodes"]]
+
+
+def test_neighborhood(client):
+    data = get(client, neighborhood_of="alice")
+    assert [node["id"] for node in data["nodes"]] == ["alice", "bob", "chess"]
+    # bob's other interest and alice's place are outside the neighborhood
+    assert edge_set(data) == {frozenset(("alice", "chess")), frozenset(("bob", "chess"))}
+
+
+@pytest.mark.parametrize("node_id", ["nobody", "chess"])
+def test_neighborhood_of_non_person_is_empty(client, node_id):
+    assert get(client, neighborhood_of=node_id) == {"nodes": [], "edges": []}
+
+
+def test_neighborhood_with_filters(client):
+    people = get(client, neighborhood_of="alice", type="person")
+    assert [node["id"] for node in people["nodes"]] == ["alice", "bob"]
+    assert people["edges"] == []
+    page = get(client, neighborhood_of="alice", offset=1, limit=2)
+    assert [node["id"] for node in page["nodes"]] == ["bob", "chess"]
+    assert edge_set(page) == {frozenset(("bob", "chess"))}
+    assert get(client, neighborhood_of="alice", limit=1)["edges"] == []
@@ -0,0 +1,92 @@
+import logging
+import os
+
+import networkx as nx
+import pytest
+
+import graph_store
+from graph_store import GraphStore
+from util import add_interest_edge, add_place_edge, append_graph_log, load_graph, save_graph
+
+
+def same_graph(a, b):
+    return dict(a.nodes(data=True)) == dict(b.nodes(data=True)) and \
+        {frozenset((u, v)): attrs for u, v, attrs in a.edges(data=True)} == \
+        {frozenset((u, v)): attrs for u, v, attrs in b.edges(data=True)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    graph = nx.Graph()
+    add_interest_edge(graph, "alice", "555-0001", "chess")
+    path = str(tmp_path / "graph.json")
+    save_graph(graph, path)
+    return GraphStore(path)
+
+
+def test_update_appends_to_log(store):
+    snapshot = open(store.file_path, "rb").read()
+    with store.update() as graph:
+        add_interest_edge(graph, "bob", None, "chess")
+        add_place_edge(graph, None, "bob", 42.36, -71.09)
+    assert open(store.file_path, "rb").read() == snapshot
+    assert os.path.exists(store.log_path)
+    assert same_graph(load_graph(store.file_path), store.get_graph())
+    assert store.get_graph().has_edge("bob", (42.36, -71.09))
+
+
+def test_log_replays_attribute_updates(store):
+    with store.update() as graph:
+        graph.nodes["alice"]["phone_number"] = "555-9999"
+    with store.update() as graph:
+        add_interest_edge(graph, "alice", "555-9999", "go")
+    assert os.path.exists(store.log_path)
+    replayed = GraphStore(store.file_path).get_graph()
+    assert same_graph(replayed, store.get_graph())
+    assert replayed.nodes["alice"]["phone_number"] == "555-9999"
+
+
+def test_torn_last_line_is_skipped(store, caplog):
+    with store.update() as graph:
+        add_interest_edge(graph, "bob", None, "chess")
+    # A crash mid-append leaves a partial event with no trailing newline
+    with open(store.log_path, "ab") as f:
+        f.write(b'{"op": "edge", "u": "carol", "v": ')
+    with caplog.at_level(logging.WARNING, logger="util"):
+        torn = load_graph(store.file_path)
+    assert "bob" in torn and "carol" not in torn
+    assert "Skipping unreadable line" in caplog.text
+    # The next append starts on a new line, so only the torn event is lost
+    append_graph_log([{"op": "node", "id": "dave", "attrs": {"type": "person"}}], store.log_path)
+    replayed = load_graph(store.file_path)
+    assert "bob" in replayed and "dave" in replayed and "carol" not in replayed
+
+
+def test_removal_saves_full_snapshot(store):
+    with store.update() as graph:
+        add_interest_edge(graph, "bob", None, "chess")
+    with store.update() as graph:
+        graph.remove_node("bob")
+    assert not os.path.exists(store.log_path)
+    assert "bob" not in load_graph(store.file_path)
+
+
+def test_compact_folds_log_into_snapshot(store):
+    with store.update() as graph:
+        add_interest_edge(graph, "bob", None, "chess")
+    expected = store.get_graph()
+    store.compact()
+    assert not os.path.exists(store.log_path)
+    assert same_graph(load_graph(store.file_path), expected)
+    # Nothing changed, so the graph isn't reloaded
+    assert store.get_graph() is expected
+
+
+def test_large_log_is_compacted_on_update(store, monkeypatch):
+    monkeypatch.setattr(graph_store, "MIN_COMPACT_LOG_BYTES", 0)
+    for person in ("bob", "carol"):
+        with store.update() as graph:
+            add_interest_edge(graph, person, None, "chess " * 100)
+    # The second update found a log bigger than the snapshot and wrote a new snapshot instead
+    assert not os.path.exists(store.log_path)
+    assert same_graph(load_graph(store.file_path), store.get_graph())
@@ -0,0 +1,89 @@
+import os
+import random
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from hybrid_embedding import HybridSearchEngine
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# float32 index values, compared against float64 references
+TOLERANCE = 1e-5
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    with open(os.path.join(HERE, "interests.txt")) as f:
+        topics = [line.strip() for line in f if line.strip()]
+    return [{"id": i, "text": topic} for i, topic in enumerate(topics)]
+
+
+@pytest.fixture(scope="module")
+def engine(corpus):
+    engine = HybridSearchEngine()
+    engine.preprocess_documents(corpus)
+    return engine
+
+
+@pytest.fixture(scope="module")
+def reference(corpus, engine):
+    """The engine as it was first written: rank_bm25's BM25Okapi plus a stock TfidfVectorizer."""
+    # Only the parity tests need rank_bm25, which is a dev dependency
+    rank_bm25 = pytest.importorskip("rank_bm25")
+    texts = [doc["text"] for doc in corpus]
+    bm25 = rank_bm25.BM25Okapi([engine._tokenize(text) for text in texts])
+    vectorizer = TfidfVectorizer(max_features=10000, ngram_range=(1, 2), stop_words="english",
+                                 lowercase=True, strip_accents="unicode")
+    tfidf_matrix = vectorizer.fit_transform(texts)
+
+    def scores(query):
+        return (bm25.get_scores(engine._tokenize(query)),
+                cosine_similarity(vectorizer.transform([query]), tfidf_matrix).ravel())
+    return scores
+
+
+@pytest.fixture(scope="module")
+def queries(corpus):
+    rng = random.Random(0)
+    words = " ".join(doc["text"] for doc in corpus).split()
+    return ["learning about ancient empires and battles", "physics of stars and galaxies", "", "zzzz qqqq",
+            "the and of", "Café résumé naïve",
+            *(" ".join(rng.sample(words, rng.randint(1, 6))) for _ in range(100))]
+
+
+def normalized(scores):
+    score_range = scores.max() - scores.min()
+    return np.full_like(scores, 0.5) if score_range == 0 else (scores - scores.min()) / score_range
+
+
+def test_raw_scores_match_reference(engine, reference, queries):
+    bm25_scores, tfidf_scores = engine._score_queries([engine._tokenize(query) for query in queries])
+    for q, query in enumerate(queries):
+        expected_bm25, expected_tfidf = reference(query)
+        np.testing.assert_allclose(bm25_scores[:, q], expected_bm25, rtol=TOLERANCE, atol=TOLERANCE)
+        np.testing.assert_allclose(tfidf_scores[:, q], expected_tfidf, rtol=TOLERANCE, atol=TOLERANCE)
+
+
+def test_rankings_match_reference(engine, reference, queries):
+    batch = engine.find_best_matches_batch(queries, top_k=10)
+    for query, batch_matches in zip(queries, batch):
+        bm25_scores, tfidf_scores = reference(query)
+        expected = 0.4 * normalized(bm25_scores) + 0.6 * normalized(tfidf_scores)
+        matches = engine.find_best_matches(query, top_k=10)
+        assert [m["document_id"] for m in matches] == [m["document_id"] for m in batch_matches]
+        # Documents may swap places within a tie, so compare the ranked scores, and check each
+        # returned document has the score the reference gives it
+        top = np.sort(expected)[::-1][:len(matches)]
+        np.testing.assert_allclose([m["score"] for m in matches], top, atol=TOLERANCE)
+        np.testing.assert_allclose([expected[int(m["document_id"])] for m in matches], top, atol=TOLERANCE)
+
+
+def test_saved_index_matches_fitted_engine(engine, queries, tmp_path):
+    engine.save_index(str(tmp_path / "index"))
+    loaded = HybridSearchEngine()
+    loaded.load_index(str(tmp_path / "index"))
+    assert loaded.bm25_columns == engine.bm25_columns
+    assert (loaded.score_matrix != engine.score_matrix).nnz == 0
+    assert loaded.find_best_matches_batch(queries) == engine.find_best_matches_batch(queries)
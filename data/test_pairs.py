@@ -0,0 +1,169 @@
+import math
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from util import add_interest_edge, add_place_edge, save_graph
+
+
+def random_people(n, num_interests=60, seed=0):
+    rng = random.Random(seed)
+    return {f"p{i:04d}": sum(1 << t for t in rng.sample(range(num_interests), rng.randint(0, 6))) for i in range(n)}
+
+
+def exact_jaccard(a, b):
+    union = (a | b).bit_count()
+    return (a & b).bit_count() / union if union else 0.0
+
+
+@pytest.mark.parametrize("threshold", [0.0, 0.1, 1 / 3, 0.5, 0.75, 1.0])
+def test_jaccard_pairs_matches_brute_force(server, threshold):
+    # Few interests per person, so there are plenty of duplicate and empty sets, and sizes that
+    # can't reach the threshold together
+    people = random_people(300, num_interests=12)
+    expected = sorted(
+        (u, v, exact_jaccard(people[u], people[v]))
+        for u in people for v in people
+        if u < v and exact_jaccard(people[u], people[v]) >= threshold
+    )
+    pairs = server.jaccard_pairs(people, 12, threshold)
+    assert [(u, v) for u, v, _ in pairs] == [(u, v) for u, v, _ in expected]
+    assert [s for _, _, s in pairs] == pytest.approx([s for _, _, s in expected])
+
+
+def haversine_meters(a, b, radius=6371000):
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * radius * math.asin(min(1.0, math.sqrt(h)))
+
+
+def brute_force_nearby(person_places, people, meters_threshold):
+    nearby = {}
+    for u in sorted(people):
+        for v in sorted(people):
+            if u >= v:
+                continue
+            for a in person_places.get(u, ()):
+                for b in person_places.get(v, ()):
+                    distance = haversine_meters(a, b)
+                    if distance <= meters_threshold:
+                        nearby.setdefault((u, v), []).append((a, b, distance))
+    return nearby
+
+
+def assert_nearby_matches(server, person_places, people, meters_threshold):
+    index = server.place_index(person_places)
+    nearby = server.nearby_place_pairs(index, people, meters_threshold)
+    expected = brute_force_nearby(person_places, people, meters_threshold)
+    assert nearby.keys() == expected.keys()
+    for pair, entries in nearby.items():
+        found = sorted((tuple(e["nearby_place_person_1_latlong"]), tuple(e["nearby_place_person_2_latlong"]),
+                        e["distance_meters"]) for e in entries)
+        wanted = sorted(expected[pair])
+        assert [(a, b) for a, b, _ in found] == [(a, b) for a, b, _ in wanted]
+        assert [d for _, _, d in found] == pytest.approx([d for _, _, d in wanted], abs=0.01)
+
+
+def test_nearby_place_pairs_shared_place_at_zero_meters(server):
+    person_places = {"a": [(42.36, -71.09)], "b": [(42.36, -71.09)], "c": [(42.3601, -71.09)]}
+    assert_nearby_matches(server, person_places, {"a", "b", "c"}, 0)
+    nearby = server.nearby_place_pairs(server.place_index(person_places), {"a", "b", "c"}, 0)
+    assert list(nearby) == [("a", "b")]
+    assert nearby[("a", "b")][0]["distance_meters"] == 0
+
+
+def test_nearby_place_pairs_only_pairs_people_given(server):
+    person_places = {"a": [(42.36, -71.09)], "b": [(42.3605, -71.0905)], "c": [(42.3602, -71.0902)]}
+    assert_nearby_matches(server, person_places, {"a", "c"}, 1000)
+    nearby = server.nearby_place_pairs(server.place_index(person_places), {"a", "c"}, 1000)
+    assert list(nearby) == [("a", "c")]
+    assert server.nearby_place_pairs(server.place_index(person_places), {"b"}, 1000) == {}
+
+
+@pytest.mark.parametrize("meters_threshold", [0, 250, 2000, 10000])
+def test_nearby_place_pairs_matches_brute_force(server, meters_threshold):
+    rng = random.Random(1)
+    # Several places per person, in and around one city
+    person_places = {f"p{i:02d}": [(42.3 + rng.random() * 0.1, -71.1 + rng.random() * 0.1)
+                                   for _ in range(rng.randint(1, 4))] for i in range(40)}
+    person_places["p00"].append(person_places["p01"][0])
+    people = set(rng.sample(sorted(person_places), 30)) | {"p00", "p01"}
+    assert_nearby_matches(server, person_places, people, meters_threshold)
+
+
+def test_get_pairs_nearby_place_returns_place_information(server, tmp_path, monkeypatch):
+    graph = nx.Graph()
+    for person, place in {"a": (42.36, -71.09), "b": (42.361, -71.09), "c": (40.71, -74.0)}.items():
+        add_interest_edge(graph, person, None, "chess")
+        add_place_edge(graph, None, person, *place)
+    monkeypatch.chdir(tmp_path)
+    save_graph(graph, server.GRAPH_FILE)
+    with TestClient(server.app) as client:
+        response = client.post("/get_pairs_nearby_place", json={"jaccard_threshold": 0.5, "meters_threshold": 1000})
+    assert response.status_code == 200
+    pairs = response.json()["pairs"]
+    assert [(p["person1"], p["person2"]) for p in pairs] == [("a", "b")]
+    [place] = pairs[0]["place_information"]
+    assert place.keys() == {"nearby_place_person_1_latlong", "nearby_place_person_2_latlong", "distance_meters"}
+    assert place["nearby_place_person_1_latlong"] == [42.36, -71.09]
+    assert place["nearby_place_person_2_latlong"] == [42.361, -71.09]
+    assert place["distance_meters"] == pytest.approx(haversine_meters((42.36, -71.09), (42.361, -71.09)), abs=0.01)
+
+
+def test_pairs_within_buckets_matches_brute_force(server):
+    keys = np.random.default_rng(0).integers(0, 5, 40).astype(np.uint64)
+    expected = {(i, j) for i in range(40) for j in range(i + 1, 40) if keys[i] == keys[j]}
+    pairs = server._pairs_within_buckets(keys)
+    assert {tuple(p) for p in pairs.tolist()} == expected
+    assert len(pairs) == len(expected)
+
+
+@pytest.mark.parametrize("threshold", [0.3, 0.5, 0.8])
+@pytest.mark.parametrize("num_perm", [64, 128, 256])
+def test_lsh_bands_favor_recall_at_threshold(server, threshold, num_perm):
+    bands, rows = server.lsh_bands(threshold, num_perm)
+    assert bands * rows <= num_perm
+    # A pair exactly at the threshold should usually collide, not coin-flip
+    assert 1 - (1 - threshold ** rows) ** bands > 0.8
+
+
+@pytest.mark.parametrize("threshold", [0.3, 0.5, 0.7])
+def test_approximate_pairs_are_exact_and_recall_most(server, threshold):
+    people = random_people(1500)
+    index = server.minhash_index(people, 60, 128)
+    approx = server.approximate_jaccard_pairs(index, threshold)
+    exact = {(u, v) for u, v in
+             ((u, v) for u in people for v in people if u < v)
+             if exact_jaccard(people[u], people[v]) >= threshold}
+    found = {(u, v) for u, v, _ in approx}
+    assert found <= exact
+    assert len(found) >= 0.9 * len(exact)
+    for u, v, s in approx:
+        assert s == pytest.approx(exact_jaccard(people[u], people[v]))
+
+
+def test_get_pairs_approx_only_accepts_listed_num_perm(server, tmp_path, monkeypatch):
+    graph = nx.Graph()
+    for person, interests in {"a": ["x", "y"], "b": ["x", "y"], "c": ["z"]}.items():
+        for interest in interests:
+            add_interest_edge(graph, person, None, interest)
+    monkeypatch.chdir(tmp_path)
+    save_graph(graph, server.GRAPH_FILE)
+    with TestClient(server.app) as client:
+        for num_perm in server.MINHASH_NUM_PERMS:
+            response = client.get("/get_pairs_approx", params={"threshold": 0.5, "num_perm": num_perm})
+            assert response.status_code == 200
+            assert [(p["person1"], p["person2"]) for p in response.json()["pairs"]] == [("a", "b")]
+        assert client.get("/get_pairs_approx", params={"threshold": 0.5, "num_perm": 100}).status_code == 422
+
+
+def test_get_pairs_only_serves_the_graph_file(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_graph(nx.Graph(), server.GRAPH_FILE)
+    with TestClient(server.app) as client:
+        assert client.get("/get_pairs", params={"graph_file": server.GRAPH_FILE}).status_code == 200
+        for endpoint in ("/get_pairs", "/get_pairs_approx"):
+            assert client.get(endpoint, params={"graph_file": "/etc/passwd"}).status_code == 400
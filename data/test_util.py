@@ -0,0 +1,41 @@
+import logging
+import os
+
+import networkx as nx
+
+from util import add_best_interest_matches, add_best_interest_matches_batch, find_best_matches, find_best_matches_batch
+
+TOPICS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "interests.txt")
+
+PEOPLE = [
+    ("alice", "555-0001", "learning about ancient empires and battles"),
+    ("bob", None, "physics of stars and galaxies"),
+    # Scores the same against every topic, 0.5 after normalization, so nothing passes the threshold
+    ("carol", "555-0003", "zzzz qqqq"),
+    ("dave", None, "cooking and food preparation"),
+]
+
+
+def test_find_best_matches_batch_matches_single_queries():
+    queries = [query for _, _, query in PEOPLE]
+    batch = find_best_matches_batch(queries, TOPICS_FILE, top_n=5, score_threshold=0.6)
+    assert batch == [find_best_matches(query, TOPICS_FILE, top_n=5, score_threshold=0.6) for query in queries]
+    assert batch[2] == [] and all(batch[i] for i in (0, 1, 3))
+
+
+def test_find_best_matches_batch_without_topics_file(tmp_path, caplog):
+    with caplog.at_level(logging.ERROR, logger="util"):
+        assert find_best_matches_batch(["chess", "go"], str(tmp_path / "missing.txt")) == [[], []]
+    assert "Topics file not found" in caplog.text
+
+
+def test_add_best_interest_matches_batch_matches_single_adds():
+    expected = nx.Graph()
+    for person_id, phone_number, query in PEOPLE:
+        add_best_interest_matches(expected, person_id, phone_number, query, TOPICS_FILE, top_n=3, score_threshold=0.6)
+    graph = nx.Graph()
+    add_best_interest_matches_batch(graph, PEOPLE, TOPICS_FILE, top_n=3, score_threshold=0.6)
+    assert dict(graph.nodes(data=True)) == dict(expected.nodes(data=True))
+    assert {frozenset(edge) for edge in graph.edges} == {frozenset(edge) for edge in expected.edges}
+    # People without matches aren't added at all
+    assert "carol" not in graph and "alice" in graph
@@ -1,3 +1,4 @@
+import logging
 from util import add_best_interest_matches, load_graph, save_graph, add_interest_edge
 
 GRAPH_FILE = 'graph.json'
@@ -119,6 +120,7 @@ def create_comprehensive_example():
     return people_graph
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s')
     people_graph = load_graph(GRAPH_FILE)
     add_interest_edge(people_graph, 'diana_art', None, 'Learning')
     save_graph(people_graph, GRAPH_FILE)
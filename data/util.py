@@ -1,9 +1,18 @@
-from hybrid_embedding import find_best_matches as hybrid_find_best_matches
+from functools import lru_cache
+from hybrid_embedding import HybridSearchEngine
+import logging
 import networkx as nx 
-import json
+import mmap
+import orjson
+import os
+import tempfile
 from networkx.readwrite import json_graph
 from typing import Optional
-from geopy.distance import geodesic
+
+# Search errors and skipped change log lines; graph loads/saves are logged at info level and
+# per-edge messages from the ingest helpers at debug level, enable them with
+# logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
 
 GRAPH_FILE = 'graph.json'
 TOPICS_FILE = 'interests.txt'
@@ -13,19 +22,35 @@ def get_interests_for_person(graph: nx.Graph, person_id: str) -> list[str]:
     """Returns a list of interests connected to a specific person."""
     if person_id not in graph:
         return []
-    # graph.neighbors(node) returns an iterator of all connected nodes
-    return [node for node in graph.neighbors(person_id) if graph.nodes[node].get('type') == 'interest']
+    # graph.adj[node] maps each connected node to the edge data; iterating it skips the neighbors() wrapper
+    nodes = graph.nodes
+    return [node for node in graph.adj[person_id] if nodes[node].get('type') == 'interest']
 
 def get_people_for_interest(graph: nx.Graph, interest: str) -> list[str]:
     """Returns a list of people connected to a specific interest."""
     if interest not in graph:
         return []
-    return [node for node in graph.neighbors(interest) if graph.nodes[node].get('type') == 'person']
+    nodes = graph.nodes
+    return [node for node in graph.adj[interest] if nodes[node].get('type') == 'person']
 
 # =====
 
 
 
+@lru_cache(maxsize=8)
+def _engine_for(topics_file_path: str, mtime_ns: int) -> HybridSearchEngine:
+    """
+    Returns a search engine fitted on a topics file as it was at mtime_ns. Cached engines are never
+    refitted, so they can be shared between threads; an edited file gets a new engine.
+    """
+    with open(topics_file_path, 'r') as f:
+        topics = [line.strip() for line in f if line.strip()]
+    if not topics:
+        raise ValueError("Topics file is empty or contains no valid topics.")
+    engine = HybridSearchEngine()
+    engine.preprocess_documents([{"id": i, "text": topic} for i, topic in enumerate(topics)])
+    return engine
+
 def find_best_matches(query: str, topics_file_path: str, top_n: int = 3, score_threshold: float = 0.5) -> list[dict]:
     """
     Finds the best matching topics for a given query from a list of topics in a file.
@@ -41,90 +66,228 @@ def find_best_matches(query: str, topics_file_path: str, top_n: int = 3, score_t
         list[dict]: A list of dictionaries, where each dict contains a 'topic' and its 'score'.
                     Returns an empty list if no matches are found above the threshold.
     """
-    # 1. Read topics from the file
+    # 1. Get the engine indexed on the topics file (cached until the file changes)
     try:
-        with open(topics_file_path, 'r') as f:
-            topics = [line.strip() for line in f if line.strip()]
-        if not topics:
-            raise ValueError("Topics file is empty or contains no valid topics.")
+        engine = _engine_for(topics_file_path, os.stat(topics_file_path).st_mtime_ns)
     except FileNotFoundError:
-        print(f"Error: Topics file not found at '{topics_file_path}'")
+        log.error("Topics file not found at '%s'", topics_file_path)
         return []
     
-    # 2. Convert topics to the document format expected by hybrid search
-    documents = []
-    for i, topic in enumerate(topics):
-        documents.append({
-            "id": i,
-            "text": topic
-        })
-    
-    # 3. Use hybrid BM25 + TF-IDF search for matching
+    # 2. Use hybrid BM25 + TF-IDF search for matching
     try:
-        hybrid_results = hybrid_find_best_matches(
+        hybrid_results = engine.find_best_matches(
             query=query,
-            documents=documents,
-            top_k=min(top_n, len(topics)),
+            top_k=min(top_n, len(engine.documents)),
             bm25_weight=0.4,  # Good balance for topic matching
-            tfidf_weight=0.6
+            tfidf_weight=0.6,
+            score_threshold=score_threshold
         )
         
-        # 4. Convert results to the expected format and apply score threshold
-        matches = []
-        for result in hybrid_results:
-            if result['score'] >= score_threshold:
-                matches.append({
-                    "topic": result['document']['text'],
-                    "score": result['score']
-                })
-        
-        return matches
+        # 3. Convert results to the expected format
+        return [{"topic": result['document']['text'], "score": result['score']} for result in hybrid_results]
         
     except Exception as e:
-        print(f"Error during hybrid search: {e}")
+        log.error("Error during hybrid search: %s", e)
         return []
 
+def find_best_matches_batch(queries: list[str], topics_file_path: str, top_n: int = 3, score_threshold: float = 0.5) -> list[list[dict]]:
+    """
+    find_best_matches for several queries, scored together in one pass over the topic index.
+
+    Args:
+        queries (list[str]): The input strings to match.
+        topics_file_path (str): The path to the .txt file containing topics.
+        top_n (int): The maximum number of top matches to return per query.
+        score_threshold (float): The minimum similarity score for a topic to be considered a match.
+
+    Returns:
+        list[list[dict]]: One list of {'topic', 'score'} matches per query, in the same order.
+    """
+    try:
+        engine = _engine_for(topics_file_path, os.stat(topics_file_path).st_mtime_ns)
+    except FileNotFoundError:
+        log.error("Topics file not found at '%s'", topics_file_path)
+        return [[] for _ in queries]
+    
+    try:
+        hybrid_results = engine.find_best_matches_batch(
+            queries=queries,
+            top_k=min(top_n, len(engine.documents)),
+            bm25_weight=0.4,
+            tfidf_weight=0.6,
+            score_threshold=score_threshold
+        )
+        return [
+            [{"topic": result['document']['text'], "score": result['score']} for result in results]
+            for results in hybrid_results
+        ]
+        
+    except Exception as e:
+        log.error("Error during hybrid search: %s", e)
+        return [[] for _ in queries]
+
+# os.umask can only be read by setting it, so it is read once at import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def graph_log_path(file_path: str) -> str:
+    """Path of the append-only change log kept next to a graph file."""
+    return file_path + '.log'
+
 def load_graph(file_path: str) -> nx.Graph:
-    """Loads a graph from a JSON file. If the file doesn't exist, returns a new empty graph."""
+    """
+    Loads a graph from a JSON file and replays its change log on top. If the file doesn't exist,
+    starts from a new empty graph.
+    """
     try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        return json_graph.node_link_graph(data)
+        # Parse straight from the mapped file rather than copying it into a bytes object first
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                data = orjson.loads(view)
+        graph = json_graph.node_link_graph(data)
     except FileNotFoundError:
-        print(f"Graph file not found. Creating a new graph.")
-        return nx.Graph()
+        log.info("Graph file %s not found. Creating a new graph.", file_path)
+        graph = nx.Graph()
+    replay_graph_log(graph, graph_log_path(file_path))
+    return graph
+
+def _fsync_directory(directory: str):
+    """Flushes a directory entry (e.g. a rename into it) to disk. Windows can't open directories, and doesn't need to."""
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
 def save_graph(graph: nx.Graph, file_path: str):
-    """Saves a graph to a JSON file."""
-    data = json_graph.node_link_data(graph)
-    with open(file_path, 'w') as f:
-        json.dump(data, f, indent=4)
-    print(f"Graph saved to {file_path}")
+    """
+    Saves a graph to a compact JSON file.
+    The data is written to a temporary file that then replaces file_path, so readers never see a partial write.
+    The change log is dropped afterwards, since the new snapshot already contains everything in it;
+    the snapshot and its rename are flushed to disk first, so a crash can't lose both.
+    """
+    payload = orjson.dumps(json_graph.node_link_data(graph), option=orjson.OPT_SERIALIZE_NUMPY)
+    directory = os.path.dirname(os.path.abspath(file_path))
+    # Temporary files are created 0600; give the snapshot the mode a plain open() would have
+    try:
+        mode = os.stat(file_path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_directory(directory)
+    try:
+        os.remove(graph_log_path(file_path))
+    except FileNotFoundError:
+        pass
+    log.info("Graph saved to %s", file_path)
+
+# ===== Change log: one JSON event per line, only ever adding nodes/edges or updating their attributes
+
+def graph_changes(old: nx.Graph, new: nx.Graph) -> Optional[list[dict]]:
+    """
+    Returns the log events that turn old into new, or None if new removed anything - a node, an
+    edge or an attribute key - or changed the graph attributes. Replaying the log can only add
+    nodes, edges and attributes, so the caller has to save a full snapshot instead.
+    """
+    if old.graph != new.graph:
+        return None
+    new_nodes = new.nodes
+    for node, attrs in old.nodes(data=True):
+        if node not in new_nodes or not attrs.keys() <= new_nodes[node].keys():
+            return None
+    for u, v, attrs in old.edges(data=True):
+        if not new.has_edge(u, v) or not attrs.keys() <= new.edges[u, v].keys():
+            return None
+    events = []
+    for node, attrs in new.nodes(data=True):
+        if node not in old or old.nodes[node] != attrs:
+            events.append({"op": "node", "id": node, "attrs": attrs})
+    for u, v, attrs in new.edges(data=True):
+        if not old.has_edge(u, v) or old.edges[u, v] != attrs:
+            events.append({"op": "edge", "u": u, "v": v, "attrs": attrs})
+    return events
+
+def append_graph_log(events: list[dict], log_path: str):
+    """Appends events to a change log and flushes them to disk before returning."""
+    data = b''.join(orjson.dumps(event) + b'\n' for event in events)
+    with open(log_path, 'a+b') as f:
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                # The previous append was cut short; start on a fresh line so only it is lost
+                data = b'\n' + data
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _node_id(value):
+    # JSON turns tuple node ids (places) into lists
+    return tuple(value) if isinstance(value, list) else value
+
+def replay_graph_log(graph: nx.Graph, log_path: str) -> int:
+    """Applies the events of a change log to graph in order. Returns how many were applied."""
+    try:
+        with open(log_path, 'rb') as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return 0
+    applied = 0
+    for line in lines:
+        if not line:
+            continue
+        try:
+            event = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            log.warning("Skipping unreadable line in %s", log_path)
+            continue
+        if event['op'] == 'node':
+            graph.add_node(_node_id(event['id']), **event['attrs'])
+        else:
+            graph.add_edge(_node_id(event['u']), _node_id(event['v']), **event['attrs'])
+        applied += 1
+    return applied
+
+# =====
 
 def add_interest_edge(graph: nx.Graph, person_id: str, phone_number: Optional[str], interest: str):
     """
     Adds nodes and an edge between a person and an interest.
     Assigns a 'type' attribute to each node for easier identification.
     """
-    # networkx handles node creation automatically if they don't exist
-    graph.add_node(person_id, type='person', phone_number=phone_number)
-    graph.add_node(interest, type='interest')
-    
-    # Add the edge connecting the person to their interest
+    # networkx creates both nodes if they don't exist; their attributes are then set in place,
+    # which saves the separate add_node calls
     graph.add_edge(person_id, interest)
-    print(f"Added edge: {person_id} -> {interest}")
+    nodes = graph.nodes
+    nodes[person_id].update(type='person', phone_number=phone_number)
+    nodes[interest]['type'] = 'interest'
+    log.debug("Added edge: %s -> %s", person_id, interest)
 
 def add_place_edge(graph: nx.Graph, phone_number: Optional[str], person_id: str, latitude: float, longitude: float):
     """
     Adds a node and an edge between a person and a place.
     Assigns a 'type' attribute to each node for easier identification.
     """
-    graph.add_node(person_id, type='person', phone_number=phone_number)
-    graph.add_node((latitude, longitude), type='place') 
-    
-    # Add the edge connecting the person to the place
+    # Add the edge connecting the person to the place, creating both nodes if needed
     graph.add_edge(person_id, (latitude, longitude))
-    print(f"Added edge: {person_id} -> {latitude}, {longitude}")
+    nodes = graph.nodes
+    nodes[person_id].update(type='person', phone_number=phone_number)
+    nodes[(latitude, longitude)]['type'] = 'place'
+    log.debug("Added edge: %s -> %s, %s", person_id, latitude, longitude)
 
 
 def add_best_interest_matches(graph: nx.Graph, person_id: str, phone_number: str, query: str, topics_file_path: str, **kwargs):
@@ -138,19 +301,38 @@ def add_best_interest_matches(graph: nx.Graph, person_id: str, phone_number: str
         topics_file_path (str): Path to the list of topics.
         **kwargs: Optional arguments for find_best_matches (e.g., top_n=5, score_threshold=0.4).
     """
-    print(f"\nFinding matches for '{person_id}' with query: '{query}'")
+    log.debug("Finding matches for '%s' with query: '%s'", person_id, query)
     matches = find_best_matches(query, topics_file_path, **kwargs)
     
     if not matches:
-        print("No matches found above the score threshold.")
+        log.debug("No matches found above the score threshold.")
         return
 
     for match in matches:
         interest_topic = match['topic']
         add_interest_edge(graph, person_id, phone_number, interest_topic)
 
+def add_best_interest_matches_batch(graph: nx.Graph, people: list[tuple[str, Optional[str], str]], topics_file_path: str, **kwargs):
+    """
+    add_best_interest_matches for several people at once; all queries are matched in one batch.
+    
+    Args:
+        graph (nx.Graph): The graph to modify.
+        people (list[tuple]): (person_id, phone_number, query) for each person to add.
+        topics_file_path (str): Path to the list of topics.
+        **kwargs: Optional arguments for find_best_matches_batch (e.g., top_n=5, score_threshold=0.4).
+    """
+    all_matches = find_best_matches_batch([query for _, _, query in people], topics_file_path, **kwargs)
+    for (person_id, phone_number, query), matches in zip(people, all_matches):
+        if not matches:
+            log.debug("No matches found above the score threshold for '%s' with query: '%s'", person_id, query)
+            continue
+        for match in matches:
+            add_interest_edge(graph, person_id, phone_number, match['topic'])
+
 # --- Example Usage ---
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s')
     people_graph = load_graph(GRAPH_FILE)
     print(f"Initial nodes: {people_graph.nodes()}")
     add_interest_edge(people_graph, 'user_01', None, 'Classic Literature')